@@ -0,0 +1,147 @@
+"""Helpers for opening raw HUD workbooks and turning sheet rows into Arrow columns.
+
+Not a node module (leading underscore keeps it out of load_nodes discovery).
+"""
+
+import os
+import pickle
+from io import BytesIO
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from python_calamine import CalamineWorkbook
+from subsets_utils import load_raw_file, get_data_dir, get_fs, is_cloud
+from subsets_utils.config import raw_uri
+from subsets_utils.tracking import record_read
+
+# Rows pulled from calamine per block when streaming a sheet
+CHUNK_ROWS = 4096
+
+# Part of the sheet cache key; bump when _read_columns changes what it returns
+CACHE_VERSION = 1
+
+# Type for repetitive string columns (state codes, area names, CoCs): each
+# distinct value is stored once and rows hold an int16 index into it
+DICT_STRING = pa.dictionary(pa.int16(), pa.string())
+
+_workbooks: dict[str, CalamineWorkbook] = {}
+
+
+def load_workbook(asset_id: str, extension: str) -> CalamineWorkbook:
+    """Open a raw workbook, reusing the parsed container on repeat calls."""
+    key = f"{asset_id}.{extension}"
+    if key not in _workbooks:
+        data = load_raw_file(asset_id, extension, binary=True)
+        _workbooks[key] = CalamineWorkbook.from_filelike(BytesIO(data))
+    return _workbooks[key]
+
+
+def _source_key(asset_id: str, extension: str) -> tuple | None:
+    """(mtime, size) of a raw file, or None if it can't be stat'ed."""
+    uri = raw_uri(asset_id, extension)
+    try:
+        info = get_fs(uri).info(uri)
+    except FileNotFoundError:
+        return None
+    return (str(info.get("mtime") or info.get("LastModified")), info["size"])
+
+
+def _read_columns(
+    wb: CalamineWorkbook, sheet: str | int, usecols: set[str] | None = None
+) -> tuple[list[str], list[list]]:
+    """Stream a sheet into per-column lists, CHUNK_ROWS rows at a time."""
+    if isinstance(sheet, int):
+        rows = wb.get_sheet_by_index(sheet).iter_rows()
+    else:
+        rows = wb.get_sheet_by_name(sheet).iter_rows()
+
+    headers = [str(h) for h in next(rows)]
+    keep = [i for i, h in enumerate(headers) if usecols is None or h.lower() in usecols]
+    headers = [headers[i] for i in keep]
+    cols = [[] for _ in headers]
+
+    # Row unpacker specialized to the kept positions once, so the per-row
+    # work is a single C-level itemgetter call
+    getter = itemgetter(*keep) if keep else (lambda row: ())
+    pick = getter if len(keep) > 1 else (lambda row: (getter(row),))
+
+    # Only one block of row lists is alive at a time; each is transposed
+    # onto the column lists and then dropped
+    for block in iter(lambda: list(islice(rows, CHUNK_ROWS)), []):
+        for col, values in zip(cols, zip(*map(pick, block))):
+            col.extend(values)
+    return headers, cols
+
+
+def load_sheet_columns(
+    asset_id: str, extension: str, sheet: str | int = 0, usecols: set[str] | None = None
+) -> tuple[list[str], list[list]]:
+    """Load a sheet as (headers, columns), cached on disk across local runs.
+
+    `sheet` is a sheet name or index. `usecols` optionally limits the result
+    to headers whose lower-cased name is in the set; absent names are
+    skipped. `columns` are positionally aligned with `headers` and exclude
+    the header row.
+
+    Locally, parsed columns are pickled to `<data dir>/cache/` keyed by
+    CACHE_VERSION, the raw file's (mtime, size) and `usecols`, so decoding an
+    unchanged sheet is skipped on the next run (the workbook itself is still
+    opened if the caller calls load_workbook). Pickle rather than Arrow
+    because calamine cells are mixed-type within a column and the
+    transforms rely on their exact Python values. In cloud runs the data
+    dir is ephemeral, so the cache is bypassed.
+    """
+    key = None if is_cloud() else _source_key(asset_id, extension)
+    if key is not None:
+        key = (CACHE_VERSION, *key, tuple(sorted(usecols)) if usecols else None)
+    cache_path = Path(get_data_dir()) / "cache" / f"{asset_id}.{sheet}.columns.pickle"
+
+    if key is not None and cache_path.exists():
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Truncated or written by an incompatible version; treat as a miss
+            cached = None
+        if isinstance(cached, dict) and cached.get("key") == key:
+            record_read(f"raw/{asset_id}.{extension}")
+            return cached["headers"], cached["cols"]
+
+    headers, cols = _read_columns(load_workbook(asset_id, extension), sheet, usecols)
+
+    if key is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump({"key": key, "headers": headers, "cols": cols}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+
+    return headers, cols
+
+
+def dictionary_encode(arr: pa.Array) -> pa.Array:
+    """Dictionary-encode a low-cardinality string column as DICT_STRING."""
+    return pc.dictionary_encode(arr).cast(DICT_STRING)
+
+
+def text_array(values: list, width: int = 0, dictionary: bool = False) -> pa.Array:
+    """Build a string column, left-padding with zeros to `width`.
+
+    dictionary=True stores it as DICT_STRING, for columns with few distinct values.
+    """
+    arr = pa.array([str(v) for v in values], type=pa.string())
+    if width:
+        arr = pc.utf8_lpad(arr, width=width, padding="0")
+    return dictionary_encode(arr) if dictionary else arr
+
+
+def int_array(values: list, type: pa.DataType = pa.int64()) -> pa.Array:
+    """Build an integer column of `type` from calamine numeric cells."""
+    # One tight C loop into a contiguous buffer, which Arrow then wraps as-is;
+    # narrowing goes through Arrow's safe cast so an out-of-range value raises
+    arr = pa.array(np.fromiter(values, dtype=np.int64, count=len(values)))
+    return arr if type == pa.int64() else arr.cast(type)
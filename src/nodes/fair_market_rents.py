@@ -17,14 +17,13 @@ Combines FY2024 and FY2025 FMR data into a unified dataset with columns:
 - fmr_4br: Fair Market Rent for 4-bedroom
 """
 
-from io import BytesIO
-import pandas as pd
 import pyarrow as pa
-from python_calamine import CalamineWorkbook
-from subsets_utils import merge, validate, publish, load_raw_file
-from subsets_utils.testing import assert_valid_year, assert_positive, assert_in_set
+import pyarrow.compute as pc
+from subsets_utils import merge, validate, publish
+from subsets_utils.testing import assert_valid_year
 
 from nodes.hud_data import run as download
+from nodes._sheets import DICT_STRING, load_sheet_columns, text_array, int_array
 
 DATASET_ID = "hud_fair_market_rents"
 
@@ -53,34 +52,56 @@ METADATA = {
     },
 }
 
+# Define explicit output schema
+SCHEMA = pa.schema([
+    pa.field("state_code", DICT_STRING),
+    pa.field("state_fips", pa.string()),
+    pa.field("county_name", pa.string()),
+    pa.field("fips", pa.string()),
+    pa.field("hud_area_code", DICT_STRING),
+    pa.field("hud_area_name", DICT_STRING),
+    pa.field("metro", pa.int8()),
+    pa.field("fiscal_year", pa.string()),
+    pa.field("population", pa.int32()),
+    pa.field("fmr_0br", pa.int32()),
+    pa.field("fmr_1br", pa.int32()),
+    pa.field("fmr_2br", pa.int32()),
+    pa.field("fmr_3br", pa.int32()),
+    pa.field("fmr_4br", pa.int32()),
+])
+
+# FMR sheet columns to load (pop2020 or pop2022, depending on the year)
+SOURCE_COLUMNS = {
+    "stusps", "state", "countyname", "fips", "hud_area_code", "hud_area_name", "metro",
+    "pop2020", "pop2022", "fmr_0", "fmr_1", "fmr_2", "fmr_3", "fmr_4",
+}
+
 
-def _load_fmr_year(asset_id: str, fiscal_year: str) -> pd.DataFrame:
+def _load_fmr_year(asset_id: str, fiscal_year: str) -> pa.Table:
     """Load and standardize FMR data for a single fiscal year."""
-    xlsx_bytes = load_raw_file(asset_id, "xlsx", binary=True)
-    wb = CalamineWorkbook.from_filelike(BytesIO(xlsx_bytes))
-    rows = wb.get_sheet_by_name(wb.sheet_names[0]).to_python()
-    headers = [str(h).lower() for h in rows[0]]
-    df = pd.DataFrame(rows[1:], columns=headers)
+    headers, columns = load_sheet_columns(asset_id, "xlsx", usecols=SOURCE_COLUMNS)
+    cols = dict(zip((h.lower() for h in headers), columns))
+    n = len(cols["fips"])
 
     # Determine population column name (varies by year)
-    pop_col = "pop2020" if "pop2020" in df.columns else "pop2022"
-
-    return pd.DataFrame({
-        "state_code": df["stusps"].astype(str),
-        "state_fips": df["state"].astype(str).str.zfill(2),
-        "county_name": df["countyname"].astype(str),
-        "fips": df["fips"].astype(str).str.zfill(9),
-        "hud_area_code": df["hud_area_code"].astype(str),
-        "hud_area_name": df["hud_area_name"].astype(str),
-        "metro": df["metro"].astype(int),
-        "fiscal_year": fiscal_year,
-        "population": df[pop_col].astype(int),
-        "fmr_0br": df["fmr_0"].astype(int),
-        "fmr_1br": df["fmr_1"].astype(int),
-        "fmr_2br": df["fmr_2"].astype(int),
-        "fmr_3br": df["fmr_3"].astype(int),
-        "fmr_4br": df["fmr_4"].astype(int),
-    })
+    pop_col = "pop2020" if "pop2020" in cols else "pop2022"
+
+    return pa.table({
+        "state_code": text_array(cols["stusps"], dictionary=True),
+        "state_fips": text_array(cols["state"], 2),
+        "county_name": text_array(cols["countyname"]),
+        "fips": text_array(cols["fips"], 9),
+        "hud_area_code": text_array(cols["hud_area_code"], dictionary=True),
+        "hud_area_name": text_array(cols["hud_area_name"], dictionary=True),
+        "metro": int_array(cols["metro"], pa.int8()),
+        "fiscal_year": pa.repeat(pa.scalar(fiscal_year, pa.string()), n),
+        "population": int_array(cols[pop_col], pa.int32()),
+        "fmr_0br": int_array(cols["fmr_0"], pa.int32()),
+        "fmr_1br": int_array(cols["fmr_1"], pa.int32()),
+        "fmr_2br": int_array(cols["fmr_2"], pa.int32()),
+        "fmr_3br": int_array(cols["fmr_3"], pa.int32()),
+        "fmr_4br": int_array(cols["fmr_4"], pa.int32()),
+    }, schema=SCHEMA)
 
 
 def test(table: pa.Table) -> None:
@@ -93,14 +114,14 @@ def test(table: pa.Table) -> None:
             "fips": "string",
             "hud_area_code": "string",
             "hud_area_name": "string",
-            "metro": "int",
+            "metro": "int8",
             "fiscal_year": "string",
-            "population": "int",
-            "fmr_0br": "int",
-            "fmr_1br": "int",
-            "fmr_2br": "int",
-            "fmr_3br": "int",
-            "fmr_4br": "int",
+            "population": "int32",
+            "fmr_0br": "int32",
+            "fmr_1br": "int32",
+            "fmr_2br": "int32",
+            "fmr_3br": "int32",
+            "fmr_4br": "int32",
         },
         "not_null": ["state_code", "county_name", "fips", "fiscal_year", "fmr_2br"],
         "unique": ["fips", "fiscal_year"],
@@ -109,22 +130,20 @@ def test(table: pa.Table) -> None:
 
     # Validate fiscal years
     assert_valid_year(table, "fiscal_year")
-    fiscal_years = set(table.column("fiscal_year").to_pylist())
+    fiscal_years = set(pc.unique(table.column("fiscal_year")).to_pylist())
     assert fiscal_years == {"2024", "2025"}, f"Expected FY2024 and FY2025, got {fiscal_years}"
 
     # Validate FMRs are positive
-    assert_positive(table, "fmr_0br")
-    assert_positive(table, "fmr_1br")
-    assert_positive(table, "fmr_2br")
-    assert_positive(table, "fmr_3br")
-    assert_positive(table, "fmr_4br")
+    for col in ("fmr_0br", "fmr_1br", "fmr_2br", "fmr_3br", "fmr_4br"):
+        assert pc.min(table.column(col)).as_py() >= 0, f"Column '{col}' has negative values"
 
     # Validate metro is 0 or 1
-    assert_in_set(table, "metro", {0, 1})
+    metro = set(pc.unique(table.column("metro")).to_pylist())
+    assert metro <= {0, 1}, f"Unexpected metro values: {metro - {0, 1}}"
 
     # Validate state codes
-    state_codes = set(table.column("state_code").to_pylist())
-    assert len(state_codes) >= 50, f"Expected at least 50 states, got {len(state_codes)}"
+    n_states = pc.count_distinct(table.column("state_code").cast(pa.string())).as_py()
+    assert n_states >= 50, f"Expected at least 50 states, got {n_states}"
 
     print(f"  Validated {len(table):,} Fair Market Rent records")
 
@@ -134,17 +153,14 @@ def run():
     print("Transforming Fair Market Rents...")
 
     # Load both years
-    df_2024 = _load_fmr_year("hud_fmr_2024", "2024")
-    print(f"  Loaded FY2024: {len(df_2024):,} rows")
-
-    df_2025 = _load_fmr_year("hud_fmr_2025", "2025")
-    print(f"  Loaded FY2025: {len(df_2025):,} rows")
+    table_2024 = _load_fmr_year("hud_fmr_2024", "2024")
+    table_2025 = _load_fmr_year("hud_fmr_2025", "2025")
+    print(f"  Loaded FY2024: {len(table_2024):,} rows")
+    print(f"  Loaded FY2025: {len(table_2025):,} rows")
 
     # Combine
-    df = pd.concat([df_2024, df_2025], ignore_index=True)
-    print(f"  Combined: {len(df):,} rows")
-
-    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = pa.concat_tables([table_2024, table_2025])
+    print(f"  Combined: {len(table):,} rows")
 
     test(table)
 
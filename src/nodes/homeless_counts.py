@@ -19,14 +19,19 @@ Output columns:
 - chronically_homeless: Chronically homeless individuals
 """
 
-from io import BytesIO
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 import pyarrow as pa
-from python_calamine import CalamineWorkbook
-from subsets_utils import merge, validate, publish, load_raw_file
-from subsets_utils.testing import assert_valid_year, assert_in_set
+import pyarrow.compute as pc
+from subsets_utils import merge, validate, publish
+from subsets_utils.testing import assert_valid_year
 
 from nodes.hud_data import run as download
+from nodes._sheets import DICT_STRING, dictionary_encode, load_workbook, load_sheet_columns
 
 DATASET_ID = "hud_homeless_counts"
 
@@ -56,78 +61,129 @@ METADATA = {
 # Years to process (each is a sheet in the Excel file)
 YEARS = list(range(2007, 2025))
 
+# CoC identifier format (e.g., AK-500), checked in test()
+COC_NUMBER_PATTERN = r"^[A-Z]{2}-\d{3,}$"
+
+# Define explicit schema to avoid null type columns
+SCHEMA = pa.schema([
+    pa.field("coc_number", DICT_STRING, nullable=False),
+    pa.field("coc_name", DICT_STRING, nullable=True),
+    pa.field("year", pa.string(), nullable=False),
+    pa.field("count_type", pa.string(), nullable=False),
+    pa.field("total", pa.int32(), nullable=True),
+    pa.field("under_18", pa.int32(), nullable=True),
+    pa.field("age_18_to_24", pa.int32(), nullable=True),
+    pa.field("over_24", pa.int32(), nullable=True),
+    pa.field("individuals", pa.int32(), nullable=True),
+    pa.field("people_in_families", pa.int32(), nullable=True),
+    pa.field("veterans", pa.int32(), nullable=True),
+    pa.field("chronically_homeless", pa.int32(), nullable=True),
+])
+
+# Column-name prefix for each shelter type in the PIT sheets
+SHELTER_BASES = {
+    "Overall": "Overall Homeless",
+    "Sheltered": "Sheltered Total Homeless",
+    "Unsheltered": "Unsheltered Homeless",
+}
 
-def _safe_int(val):
-    """Convert to int, handling NaN/None."""
-    if pd.isna(val):
-        return None
-    try:
-        return int(val)
-    except (ValueError, TypeError):
-        return None
+# Header patterns per output field, tried in order. {base} is the shelter
+# type's prefix; {chronic} is the same with "Chronically Homeless".
+FIELD_PATTERNS = {
+    "total": ["{base}"],
+    "under_18": ["{base} - Under 18"],
+    "age_18_to_24": ["{base} - Age 18 to 24"],
+    "over_24": ["{base} - Over 24"],
+    "individuals": ["{base} Individuals"],
+    "people_in_families": ["{base} People in Families"],
+    "veterans": ["{base} Veterans"],
+    "chronically_homeless": ["{chronic}", "{chronic} Individuals"],
+}
+
+# FIELD_PATTERNS expanded per shelter type and lower-cased once at import
+_PATTERNS = {
+    shelter_type: {
+        field: [
+            p.format(base=base, chronic=base.replace("Homeless", "Chronically Homeless")).lower()
+            for p in patterns
+        ]
+        for field, patterns in FIELD_PATTERNS.items()
+    }
+    for shelter_type, base in SHELTER_BASES.items()
+}
 
+# Every distinct expanded pattern, resolved once per sheet layout
+_ALL_PATTERNS = list(dict.fromkeys(
+    p for fields in _PATTERNS.values() for patterns in fields.values() for p in patterns
+))
 
-def _get_col(df: pd.DataFrame, patterns: list[str]):
-    """Find first matching column from patterns list."""
-    for pattern in patterns:
-        matching = [c for c in df.columns if pattern.lower() in c.lower()]
-        if matching:
-            return matching[0]
-    return None
 
+def _to_int(values: list) -> pa.Array:
+    """Convert a column to nullable int32 counts, mapping blanks/non-numeric to null."""
+    nums = np.trunc(pd.to_numeric(values, errors="coerce"))
+    return pa.array(nums, from_pandas=True).cast(pa.int32())
 
-def _extract_shelter_type(df: pd.DataFrame, year: int, shelter_type: str) -> list[dict]:
-    """Extract counts for a specific shelter type from a year's data.
 
-    shelter_type: 'Overall', 'Sheltered', or 'Unsheltered'
-    """
-    rows = []
-
-    if shelter_type == "Overall":
-        base = "Overall Homeless"
-    elif shelter_type == "Sheltered":
-        base = "Sheltered Total Homeless"
-    else:
-        base = "Unsheltered Homeless"
-
-    chronic_base = base.replace("Homeless", "Chronically Homeless")
-
-    total_col = _get_col(df, [base])
-    under_18_col = _get_col(df, [f"{base} - Under 18"])
-    age_18_24_col = _get_col(df, [f"{base} - Age 18 to 24"])
-    over_24_col = _get_col(df, [f"{base} - Over 24"])
-    individuals_col = _get_col(df, [f"{base} Individuals"])
-    families_col = _get_col(df, [f"{base} People in Families"])
-    veterans_col = _get_col(df, [f"{base} Veterans"])
-    chronic_col = _get_col(df, [chronic_base, f"{chronic_base} Individuals"])
-
-    for _, row in df.iterrows():
-        coc_number = row.get("CoC Number", "")
-        coc_name = row.get("CoC Name", "")
-
-        if not coc_number or pd.isna(coc_number):
-            continue
+def _to_text(values: list) -> pa.Array:
+    """Convert a column to stripped strings, mapping blanks/NaN to ''."""
+    text = pd.Series(values, dtype=object).fillna("").astype(str).str.strip()
+    return pa.array(text, type=pa.string())
 
-        record = {
-            "coc_number": str(coc_number).strip(),
-            "coc_name": str(coc_name).strip() if coc_name and not pd.isna(coc_name) else "",
-            "year": str(year),
-            "count_type": shelter_type,
-            "total": _safe_int(row.get(total_col)) if total_col else None,
-            "under_18": _safe_int(row.get(under_18_col)) if under_18_col else None,
-            "age_18_to_24": _safe_int(row.get(age_18_24_col)) if age_18_24_col else None,
-            "over_24": _safe_int(row.get(over_24_col)) if over_24_col else None,
-            "individuals": _safe_int(row.get(individuals_col)) if individuals_col else None,
-            "people_in_families": _safe_int(row.get(families_col)) if families_col else None,
-            "veterans": _safe_int(row.get(veterans_col)) if veterans_col else None,
-            "chronically_homeless": _safe_int(row.get(chronic_col)) if chronic_col else None,
+
+@lru_cache(maxsize=None)
+def _resolve_columns(lowers: tuple[str, ...]) -> dict[str, dict[str, int | None]]:
+    """Resolve every shelter type's metric columns against a sheet's headers.
+
+    Each distinct pattern is looked up once, stopping at its first matching
+    header; each field then takes its first pattern that matched. Cached on
+    the header tuple: consecutive years often share a layout, so a worker
+    that handles several sheets only resolves each distinct layout once.
+    """
+    first: dict[str, int] = {}
+    for pattern in _ALL_PATTERNS:
+        idx = next((i for i, h in enumerate(lowers) if pattern in h), None)
+        if idx is not None:
+            first[pattern] = idx
+
+    return {
+        shelter_type: {
+            field: next((first[p] for p in patterns if p in first), None)
+            for field, patterns in fields.items()
         }
+        for shelter_type, fields in _PATTERNS.items()
+    }
 
-        # Only include if we have at least a total count
-        if record["total"] is not None:
-            rows.append(record)
 
-    return rows
+def _extract_year(cols: list[list], lowers: list[str], coc_cols: tuple[int, int], year: int) -> pa.Table:
+    """Extract counts for every shelter type from one year's sheet columns.
+
+    cols: sheet columns (header row excluded), positionally aligned with lowers
+    lowers: lower-cased sheet headers
+    coc_cols: positions of the CoC number and CoC name columns
+
+    The CoC key columns and row mask are built once and shared by the three
+    shelter types, which only differ in their metric columns.
+    """
+    n = len(cols[0])
+    number_idx, name_idx = coc_cols
+    coc_number = _to_text(cols[number_idx])
+    shared = {
+        "coc_number": dictionary_encode(coc_number),
+        "coc_name": dictionary_encode(_to_text(cols[name_idx])),
+        "year": pa.repeat(pa.scalar(str(year), pa.string()), n),
+    }
+    # Only include if we have a CoC and at least a total count; the sheets'
+    # trailing "Total" summary row is not a CoC
+    has_coc = pc.and_(pc.greater(pc.utf8_length(coc_number), 0), pc.not_equal(coc_number, "Total"))
+
+    tables = []
+    for shelter_type, col_map in _resolve_columns(tuple(lowers)).items():
+        arrays = {**shared, "count_type": pa.repeat(pa.scalar(shelter_type, pa.string()), n)}
+        for field, idx in col_map.items():
+            arrays[field] = _to_int(cols[idx]) if idx is not None else pa.nulls(n, pa.int32())
+        table = pa.Table.from_arrays([arrays[name] for name in SCHEMA.names], schema=SCHEMA)
+        tables.append(table.filter(pc.and_(has_coc, pc.is_valid(arrays["total"]))))
+    return pa.concat_tables(tables)
 
 
 def test(table: pa.Table) -> None:
@@ -138,7 +194,7 @@ def test(table: pa.Table) -> None:
             "coc_name": "string",
             "year": "string",
             "count_type": "string",
-            "total": "int",
+            "total": "int32",
         },
         "not_null": ["coc_number", "year", "count_type", "total"],
         "unique": ["coc_number", "year", "count_type"],
@@ -147,77 +203,80 @@ def test(table: pa.Table) -> None:
 
     # Validate years are in expected range
     assert_valid_year(table, "year")
-    years = set(table.column("year").to_pylist())
+    years = set(pc.unique(table.column("year")).to_pylist())
     assert "2024" in years, "Should include 2024 data"
     assert "2007" in years or "2008" in years, "Should include early years"
 
     # Validate count types
-    assert_in_set(table, "count_type", {"Overall", "Sheltered", "Unsheltered"})
+    count_types = set(pc.unique(table.column("count_type")).to_pylist())
+    assert count_types <= set(SHELTER_BASES), f"Unexpected count types: {count_types - set(SHELTER_BASES)}"
 
-    # Validate CoC number format (XX-NNN)
-    coc_numbers = table.column("coc_number").to_pylist()
-    sample = coc_numbers[:10]
-    for coc in sample:
-        assert len(coc) >= 6, f"CoC number should be at least 6 chars: {coc}"
-        assert "-" in coc, f"CoC number should contain dash: {coc}"
+    # Validate CoC number format (XX-NNN) across every row
+    coc_numbers = table.column("coc_number").cast(pa.string())
+    malformed = coc_numbers.filter(pc.invert(pc.match_substring_regex(coc_numbers, COC_NUMBER_PATTERN)))
+    assert len(malformed) == 0, f"Malformed CoC numbers: {pc.unique(malformed)[:5].to_pylist()}"
 
     # Check we have reasonable coverage
-    unique_cocs = len(set(coc_numbers))
+    unique_cocs = pc.count_distinct(coc_numbers).as_py()
     assert unique_cocs >= 300, f"Expected at least 300 CoCs, got {unique_cocs}"
 
     print(f"  Validated {len(table):,} Homeless Count records across {unique_cocs} CoCs")
 
 
+def _process_year(year: int) -> pa.Table | None:
+    """Extract all shelter types from one year's sheet. Runs in a worker process.
+
+    Returns None if the sheet can't be read or lacks the CoC key columns.
+    """
+    try:
+        headers, cols = load_sheet_columns("hud_pit_2024", "xlsb", str(year))
+        lowers = [h.lower() for h in headers]
+        coc_cols = (lowers.index("coc number"), lowers.index("coc name"))
+    except Exception as e:
+        print(f"  Warning: Could not read year {year}: {e}", flush=True)
+        return None
+
+    return _extract_year(cols, lowers, coc_cols, year)
+
+
 def run():
     """Transform Point-in-Time Homeless Counts data."""
     print("Transforming Point-in-Time Homeless Counts...")
 
-    xlsb_bytes = load_raw_file("hud_pit_2024", "xlsb", binary=True)
-    wb = CalamineWorkbook.from_filelike(BytesIO(xlsb_bytes))
-
-    all_rows = []
+    # Open the workbook before forking so workers inherit the parsed container
+    wb = load_workbook("hud_pit_2024", "xlsb")
 
+    years = []
     for year in YEARS:
-        sheet_name = str(year)
-        if sheet_name not in wb.sheet_names:
+        if str(year) not in wb.sheet_names:
             print(f"  Warning: Sheet {year} not found")
             continue
-        try:
-            rows = wb.get_sheet_by_name(sheet_name).to_python()
-            headers = [str(h) for h in rows[0]]
-            df = pd.DataFrame(rows[1:], columns=headers)
-        except Exception as e:
-            print(f"  Warning: Could not read year {year}: {e}")
+        years.append(year)
+
+    if not years:
+        raise ValueError(f"No PIT year sheets found; expected sheets named {YEARS[0]}-{YEARS[-1]}")
+
+    # Sheets are independent and extraction is CPU-bound, so fan years out
+    # across processes
+    with ProcessPoolExecutor(
+        max_workers=min(len(years), os.cpu_count() or 1),
+        mp_context=multiprocessing.get_context("fork"),
+    ) as executor:
+        year_tables = list(executor.map(_process_year, years))
+
+    tables = []
+    for year, year_table in zip(years, year_tables):
+        if year_table is None:
             continue
+        print(f"  {year}: {len(year_table):,} records")
+        tables.append(year_table)
+
+    if not tables:
+        raise ValueError("None of the PIT year sheets could be read")
 
-        year_rows = []
-        for shelter_type in ["Overall", "Sheltered", "Unsheltered"]:
-            rows = _extract_shelter_type(df, year, shelter_type)
-            year_rows.extend(rows)
-
-        print(f"  {year}: {len(year_rows):,} records")
-        all_rows.extend(year_rows)
-
-    print(f"  Total: {len(all_rows):,} records")
-
-    df = pd.DataFrame(all_rows)
-
-    # Define explicit schema to avoid null type columns
-    schema = pa.schema([
-        pa.field("coc_number", pa.string(), nullable=False),
-        pa.field("coc_name", pa.string(), nullable=True),
-        pa.field("year", pa.string(), nullable=False),
-        pa.field("count_type", pa.string(), nullable=False),
-        pa.field("total", pa.int64(), nullable=True),
-        pa.field("under_18", pa.int64(), nullable=True),
-        pa.field("age_18_to_24", pa.int64(), nullable=True),
-        pa.field("over_24", pa.int64(), nullable=True),
-        pa.field("individuals", pa.int64(), nullable=True),
-        pa.field("people_in_families", pa.int64(), nullable=True),
-        pa.field("veterans", pa.int64(), nullable=True),
-        pa.field("chronically_homeless", pa.int64(), nullable=True),
-    ])
-    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    # Chunks already carry SCHEMA, so this only stitches them together
+    table = pa.concat_tables(tables)
+    print(f"  Total: {len(table):,} records")
 
     test(table)
 
@@ -4,7 +4,20 @@ Downloads CSV/Excel files from HUD USER portal.
 No authentication required.
 """
 
-from subsets_utils import get, save_raw_file, load_state, save_state
+import contextvars
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from subsets_utils import debug, get_client, raw_writer, load_state, save_state
+
+# Concurrent downloads (one per dataset)
+MAX_WORKERS = 4
+
+# debug's CSV logger isn't thread-safe, so downloads log one at a time
+_log_lock = threading.Lock()
 
 # HUD USER datasets
 DATASETS = {
@@ -35,6 +48,39 @@ DATASETS = {
 }
 
 
+def _fetch(dataset_info: dict, asset_id: str) -> int:
+    """Stream one dataset to the raw store. Returns the number of bytes saved."""
+    url = dataset_info["url"]
+    start = time.time()
+    status = None
+    error = None
+
+    # Stream in 1 MiB chunks into a local temp file rather than buffering the
+    # whole workbook in memory. The raw store is only written once the full
+    # body has arrived, so a dropped connection can't replace the last good
+    # copy with a truncated one.
+    with tempfile.TemporaryFile() as tmp:
+        try:
+            with get_client().stream("GET", url, timeout=120) as response:
+                status = response.status_code
+                response.raise_for_status()
+                for chunk in response.iter_bytes(chunk_size=1 << 20):
+                    tmp.write(chunk)
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            duration_ms = int((time.time() - start) * 1000)
+            with _log_lock:
+                debug.log_http_request("GET", url, status, duration_ms=duration_ms, error=error)
+
+        total = tmp.tell()
+        tmp.seek(0)
+        with raw_writer(asset_id, dataset_info["format"]) as f:
+            shutil.copyfileobj(tmp, f, 1 << 20)
+    return total
+
+
 def run():
     """Fetch all HUD housing datasets."""
     print("Fetching HUD Housing data...")
@@ -50,21 +96,33 @@ def run():
 
     print(f"  Datasets to fetch: {len(pending)}")
 
-    for i, (dataset_key, dataset_info) in enumerate(pending, 1):
-        print(f"\n[{i}/{len(pending)}] Fetching {dataset_info['name']}...")
-
-        response = get(dataset_info["url"], timeout=120)
-        response.raise_for_status()
-
-        save_raw_file(
-            response.content,
-            f"hud_{dataset_key}",
-            extension=dataset_info["format"],
-        )
-        print(f"    Saved {len(response.content):,} bytes")
-
-        completed.add(dataset_key)
-        save_state("hud_housing", {"completed": list(completed)})
+    # Downloads are latency-bound, so fetch them concurrently. Only this
+    # thread touches `completed` and the state file, so progress is saved
+    # as each download lands without needing a lock.
+    errors = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Each download runs in a copy of this context so raw_writer records
+        # its writes against the current task
+        futures = {
+            executor.submit(contextvars.copy_context().run, _fetch, dataset_info, f"hud_{dataset_key}"): dataset_key
+            for dataset_key, dataset_info in pending
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            dataset_key = futures[future]
+            name = DATASETS[dataset_key]["name"]
+            try:
+                nbytes = future.result()
+            except Exception as e:
+                print(f"\n[{i}/{len(pending)}] Failed {name}: {e}")
+                errors.append(e)
+                continue
+
+            print(f"\n[{i}/{len(pending)}] Fetched {name}: {nbytes:,} bytes")
+            completed.add(dataset_key)
+            save_state("hud_housing", {"completed": list(completed)})
+
+    if errors:
+        raise errors[0]
 
     print(f"\nIngested {len(completed)} datasets")
 
@@ -10,14 +10,13 @@ Income limit categories:
 The *_N suffix indicates household size (1-8 persons).
 """
 
-from io import BytesIO
-import pandas as pd
 import pyarrow as pa
-from python_calamine import CalamineWorkbook
-from subsets_utils import merge, validate, publish, load_raw_file
-from subsets_utils.testing import assert_valid_year, assert_positive, assert_in_set
+import pyarrow.compute as pc
+from subsets_utils import merge, validate, publish
+from subsets_utils.testing import assert_valid_year
 
 from nodes.hud_data import run as download
+from nodes._sheets import DICT_STRING, load_sheet_columns, text_array, int_array
 
 DATASET_ID = "hud_income_limits"
 
@@ -67,6 +66,29 @@ METADATA = {
     },
 }
 
+# Define explicit output schema
+SCHEMA = pa.schema([
+    pa.field("fips", pa.string()),
+    pa.field("state_code", DICT_STRING),
+    pa.field("state_fips", pa.string()),
+    pa.field("state_name", DICT_STRING),
+    pa.field("hud_area_code", DICT_STRING),
+    pa.field("hud_area_name", DICT_STRING),
+    pa.field("county_fips", pa.string()),
+    pa.field("county_name", pa.string()),
+    pa.field("metro", pa.int8()),
+    pa.field("fiscal_year", pa.string()),
+    pa.field("median_income", pa.int32()),
+    *[pa.field(f"{level}_{size}", pa.int32()) for level in ("eli", "vli", "li") for size in range(1, 9)],
+])
+
+# Income limits sheet columns to load
+SOURCE_COLUMNS = {
+    "fips", "stusps", "state", "state_name", "hud_area_code", "hud_area_name",
+    "county", "county_name", "metro", "median2024",
+    *[f"{level}_{size}" for level in ("eli", "l50", "l80") for size in range(1, 9)],
+}
+
 
 def test(table: pa.Table) -> None:
     """Validate Income Limits output."""
@@ -80,15 +102,15 @@ def test(table: pa.Table) -> None:
             "hud_area_name": "string",
             "county_fips": "string",
             "county_name": "string",
-            "metro": "int",
+            "metro": "int8",
             "fiscal_year": "string",
-            "median_income": "int",
-            "eli_1": "int",
-            "eli_4": "int",
-            "vli_1": "int",
-            "vli_4": "int",
-            "li_1": "int",
-            "li_4": "int",
+            "median_income": "int32",
+            "eli_1": "int32",
+            "eli_4": "int32",
+            "vli_1": "int32",
+            "vli_4": "int32",
+            "li_1": "int32",
+            "li_4": "int32",
         },
         "not_null": ["fips", "state_code", "county_name", "fiscal_year", "median_income"],
         "unique": ["fips"],
@@ -97,26 +119,24 @@ def test(table: pa.Table) -> None:
 
     # Validate fiscal year
     assert_valid_year(table, "fiscal_year")
-    fiscal_years = set(table.column("fiscal_year").to_pylist())
+    fiscal_years = set(pc.unique(table.column("fiscal_year")).to_pylist())
     assert fiscal_years == {"2024"}, f"Expected FY2024, got {fiscal_years}"
 
     # Validate income limits are positive
-    assert_positive(table, "median_income")
-    assert_positive(table, "eli_4")
-    assert_positive(table, "vli_4")
-    assert_positive(table, "li_4")
+    for col in ("median_income", "eli_4", "vli_4", "li_4"):
+        assert pc.min(table.column(col)).as_py() >= 0, f"Column '{col}' has negative values"
 
     # Validate income hierarchy: ELI < VLI < LI
-    df = table.to_pandas()
-    assert (df["eli_4"] <= df["vli_4"]).all(), "ELI should be <= VLI"
-    assert (df["vli_4"] <= df["li_4"]).all(), "VLI should be <= LI"
+    assert pc.all(pc.less_equal(table["eli_4"], table["vli_4"])).as_py(), "ELI should be <= VLI"
+    assert pc.all(pc.less_equal(table["vli_4"], table["li_4"])).as_py(), "VLI should be <= LI"
 
     # Validate metro is 0 or 1
-    assert_in_set(table, "metro", {0, 1})
+    metro = set(pc.unique(table.column("metro")).to_pylist())
+    assert metro <= {0, 1}, f"Unexpected metro values: {metro - {0, 1}}"
 
     # Validate state codes
-    state_codes = set(table.column("state_code").to_pylist())
-    assert len(state_codes) >= 50, f"Expected at least 50 states, got {len(state_codes)}"
+    n_states = pc.count_distinct(table.column("state_code").cast(pa.string())).as_py()
+    assert n_states >= 50, f"Expected at least 50 states, got {n_states}"
 
     print(f"  Validated {len(table):,} Income Limit records")
 
@@ -125,57 +145,53 @@ def run():
     """Transform Income Limits data."""
     print("Transforming Income Limits...")
 
-    xlsx_bytes = load_raw_file("hud_income_limits_2024", "xlsx", binary=True)
-    wb = CalamineWorkbook.from_filelike(BytesIO(xlsx_bytes))
-    rows = wb.get_sheet_by_name(wb.sheet_names[0]).to_python()
-    headers = [str(h) for h in rows[0]]
-    df = pd.DataFrame(rows[1:], columns=headers)
-    print(f"  Loaded {len(df):,} rows")
-
-    result = pd.DataFrame({
-        "fips": df["fips"].astype(str).str.zfill(9),
-        "state_code": df["stusps"].astype(str),
-        "state_fips": df["state"].astype(str).str.zfill(2),
-        "state_name": df["state_name"].astype(str),
-        "hud_area_code": df["hud_area_code"].astype(str),
-        "hud_area_name": df["hud_area_name"].astype(str),
-        "county_fips": df["county"].astype(str).str.zfill(3),
-        "county_name": df["County_Name"].astype(str),
-        "metro": df["metro"].astype(int),
-        "fiscal_year": "2024",
-        "median_income": df["median2024"].astype(int),
+    headers, columns = load_sheet_columns("hud_income_limits_2024", "xlsx", usecols=SOURCE_COLUMNS)
+    cols = dict(zip(headers, columns))
+    n = len(cols["fips"])
+    print(f"  Loaded {n:,} rows")
+
+    table = pa.table({
+        "fips": text_array(cols["fips"], 9),
+        "state_code": text_array(cols["stusps"], dictionary=True),
+        "state_fips": text_array(cols["state"], 2),
+        "state_name": text_array(cols["state_name"], dictionary=True),
+        "hud_area_code": text_array(cols["hud_area_code"], dictionary=True),
+        "hud_area_name": text_array(cols["hud_area_name"], dictionary=True),
+        "county_fips": text_array(cols["county"], 3),
+        "county_name": text_array(cols["County_Name"]),
+        "metro": int_array(cols["metro"], pa.int8()),
+        "fiscal_year": pa.repeat(pa.scalar("2024", pa.string()), n),
+        "median_income": int_array(cols["median2024"], pa.int32()),
         # Extremely Low Income (30% AMI)
-        "eli_1": df["ELI_1"].astype(int),
-        "eli_2": df["ELI_2"].astype(int),
-        "eli_3": df["ELI_3"].astype(int),
-        "eli_4": df["ELI_4"].astype(int),
-        "eli_5": df["ELI_5"].astype(int),
-        "eli_6": df["ELI_6"].astype(int),
-        "eli_7": df["ELI_7"].astype(int),
-        "eli_8": df["ELI_8"].astype(int),
+        "eli_1": int_array(cols["ELI_1"], pa.int32()),
+        "eli_2": int_array(cols["ELI_2"], pa.int32()),
+        "eli_3": int_array(cols["ELI_3"], pa.int32()),
+        "eli_4": int_array(cols["ELI_4"], pa.int32()),
+        "eli_5": int_array(cols["ELI_5"], pa.int32()),
+        "eli_6": int_array(cols["ELI_6"], pa.int32()),
+        "eli_7": int_array(cols["ELI_7"], pa.int32()),
+        "eli_8": int_array(cols["ELI_8"], pa.int32()),
         # Very Low Income (50% AMI)
-        "vli_1": df["l50_1"].astype(int),
-        "vli_2": df["l50_2"].astype(int),
-        "vli_3": df["l50_3"].astype(int),
-        "vli_4": df["l50_4"].astype(int),
-        "vli_5": df["l50_5"].astype(int),
-        "vli_6": df["l50_6"].astype(int),
-        "vli_7": df["l50_7"].astype(int),
-        "vli_8": df["l50_8"].astype(int),
+        "vli_1": int_array(cols["l50_1"], pa.int32()),
+        "vli_2": int_array(cols["l50_2"], pa.int32()),
+        "vli_3": int_array(cols["l50_3"], pa.int32()),
+        "vli_4": int_array(cols["l50_4"], pa.int32()),
+        "vli_5": int_array(cols["l50_5"], pa.int32()),
+        "vli_6": int_array(cols["l50_6"], pa.int32()),
+        "vli_7": int_array(cols["l50_7"], pa.int32()),
+        "vli_8": int_array(cols["l50_8"], pa.int32()),
         # Low Income (80% AMI)
-        "li_1": df["l80_1"].astype(int),
-        "li_2": df["l80_2"].astype(int),
-        "li_3": df["l80_3"].astype(int),
-        "li_4": df["l80_4"].astype(int),
-        "li_5": df["l80_5"].astype(int),
-        "li_6": df["l80_6"].astype(int),
-        "li_7": df["l80_7"].astype(int),
-        "li_8": df["l80_8"].astype(int),
-    })
-
-    print(f"  Transformed: {len(result):,} rows")
-
-    table = pa.Table.from_pandas(result, preserve_index=False)
+        "li_1": int_array(cols["l80_1"], pa.int32()),
+        "li_2": int_array(cols["l80_2"], pa.int32()),
+        "li_3": int_array(cols["l80_3"], pa.int32()),
+        "li_4": int_array(cols["l80_4"], pa.int32()),
+        "li_5": int_array(cols["l80_5"], pa.int32()),
+        "li_6": int_array(cols["l80_6"], pa.int32()),
+        "li_7": int_array(cols["l80_7"], pa.int32()),
+        "li_8": int_array(cols["l80_8"], pa.int32()),
+    }, schema=SCHEMA)
+
+    print(f"  Transformed: {len(table):,} rows")
 
     test(table)
 